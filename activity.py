@@ -1,6 +1,13 @@
 """Activity class object"""
+import functools
+import os
+
+# Bumped after every save so changes are seen even when the file's stat doesn't move
+_write_count = 0
 
 class Activity:
+    __slots__ = ("choice", "priority")
+
     def __init__(self, choice, priority):
         self.choice = choice
         self.priority = priority
@@ -8,15 +15,47 @@ class Activity:
     def get_activity(self):
         return self.choice
 
-def read_activities(filename):
+@functools.lru_cache(maxsize=4)
+def _read_activities_cached(filename, stamp):
+    """Parse the activities file into (choice, priority) tuples, cached until the file changes"""
     activities = []
     with open(filename) as f:
         for line in f:
-            choice, priority = ",".join(line.strip().split(',')[:-1]), line.strip().split(',')[-1]
-            activities.append(Activity(choice, int(priority)))
-    return activities
+            # Priority is after the last comma, the choice itself may contain commas
+            choice, _, priority = line.strip().rpartition(',')
+            activities.append((choice, int(priority)))
+    return tuple(activities)
+
+def _file_stamp(filename):
+    """Get the stat fields that tell one version of a file from another"""
+    # mtime alone can miss a change on coarse filesystems, saving replaces the file so the inode changes too
+    stat = os.stat(filename)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def activities_version(filename):
+    """Identify the current version of the activities file"""
+    # The write count catches every save from here, the stamp catches the file being edited outside the app
+    return (_write_count, *_file_stamp(filename))
+
+def _activity_rows(filename):
+    # Keyed on the same stamp as activities_version so a change it notices is never served from the cache
+    return _read_activities_cached(filename, _file_stamp(filename))
+
+def read_activities(filename):
+    # Build new objects each time since callers change their priorities
+    return [Activity(choice, priority) for choice, priority in _activity_rows(filename)]
+
+def read_activity_choices(filename):
+    """Read just the activity names without building Activity objects"""
+    return [choice for choice, _ in _activity_rows(filename)]
 
 def write_activities(filename, activities):
-    with open(filename, 'w') as f:
-        for activity in activities:
-            f.write(f"{activity.choice},{activity.priority}\n")
+    global _write_count
+    # Write a temporary file and swap it in so a crash can't leave a half written file behind
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        f.write("".join(f"{activity.choice},{activity.priority}\n" for activity in activities))
+    os.replace(tmp_filename, filename)
+    _write_count += 1
+    # The mtime may not have moved on coarse filesystems so drop the cache outright
+    _read_activities_cached.cache_clear()
@@ -4,19 +4,12 @@ import curses
 
 # Define a class to hold the colours
 class Colours:
+    # Colour pairs only need registering with curses once per process
+    _initialized = False
+
     def __init__(self):
-        # Initialise the colours
-        curses.start_color()
-        curses.init_pair(1, curses.COLOR_WHITE, curses.COLOR_BLACK)
-        curses.init_pair(2, curses.COLOR_BLACK, curses.COLOR_WHITE)
-        curses.init_pair(3, curses.COLOR_RED, curses.COLOR_BLACK)
-        curses.init_pair(4, curses.COLOR_GREEN, curses.COLOR_BLACK)
-        curses.init_pair(5, curses.COLOR_BLUE, curses.COLOR_BLACK)
-        curses.init_pair(6, curses.COLOR_YELLOW, curses.COLOR_BLACK)
-        curses.init_pair(7, curses.COLOR_CYAN, curses.COLOR_BLACK)
-        curses.init_pair(8, curses.COLOR_MAGENTA, curses.COLOR_BLACK)
-        curses.init_pair(9, curses.COLOR_WHITE, curses.COLOR_BLUE)
-        curses.init_pair(10, curses.COLOR_WHITE, curses.COLOR_RED)
+        if not Colours._initialized:
+            Colours.setup()
 
         # Dictionary to hold the colours
         self.colours = {
@@ -32,5 +25,43 @@ class Colours:
             "highlight_red": 10
         }
 
+        # Precompute the colour pair attributes so lookups are a single dict access
+        self._cache = {name: curses.color_pair(n) for name, n in self.colours.items()}
+        self._cache_bold = {name: pair | curses.A_BOLD for name, pair in self._cache.items()}
+
+        # Expose each colour as an attribute too (e.g. colours.black, colours.black_bold) for the render paths
+        for name in self.colours:
+            setattr(self, name, self._cache[name])
+            setattr(self, f"{name}_bold", self._cache_bold[name])
+
+    @classmethod
+    def setup(cls):
+        """Initialise the curses colour pairs, only needs doing once after curses.initscr()"""
+        curses.start_color()
+        curses.init_pair(1, curses.COLOR_WHITE, curses.COLOR_BLACK)
+        curses.init_pair(2, curses.COLOR_BLACK, curses.COLOR_WHITE)
+        curses.init_pair(3, curses.COLOR_RED, curses.COLOR_BLACK)
+        curses.init_pair(4, curses.COLOR_GREEN, curses.COLOR_BLACK)
+        curses.init_pair(5, curses.COLOR_BLUE, curses.COLOR_BLACK)
+        curses.init_pair(6, curses.COLOR_YELLOW, curses.COLOR_BLACK)
+        curses.init_pair(7, curses.COLOR_CYAN, curses.COLOR_BLACK)
+        curses.init_pair(8, curses.COLOR_MAGENTA, curses.COLOR_BLACK)
+        curses.init_pair(9, curses.COLOR_WHITE, curses.COLOR_BLUE)
+        curses.init_pair(10, curses.COLOR_WHITE, curses.COLOR_RED)
+        cls._initialized = True
+
     def get_colour(self, colour):
-        return curses.color_pair(self.colours[colour])
+        return self._cache[colour]
+
+    def get_colour_bold(self, colour):
+        return self._cache_bold[colour]
+
+# Shared instance so the colour pairs are only initialised once
+_colours = None
+
+def get_colours():
+    """Return the shared Colours instance, creating it on first use"""
+    global _colours
+    if _colours is None:
+        _colours = Colours()
+    return _colours
@@ -3,14 +3,17 @@ import curses
 import curses.ascii
 import logging
 from math import floor
-from colours import Colours
-from utils import clamp
+from colours import get_colours
+from render import RenderBuffer
+from utils import clamp, spaces, wrap_words
 
 class Component:
     def __init__(self):
         """Sets basic properties of a component"""
         self.selectable = False
         self.selected = False
+        # Only dirty components are redrawn by their container
+        self.dirty = True
 
     def update(self):
         """Update the component"""
@@ -22,10 +25,14 @@ class Component:
 
     def on_select(self):
         """Perform an action when the component is selected"""
-        pass
+        self.dirty = True
 
     def on_deselect(self):
         """Perform an action when the component is deselected"""
+        self.dirty = True
+
+    def render_to(self, buffer):
+        """Queue the component's output onto a RenderBuffer"""
         pass
 
 class Container(Component):
@@ -35,6 +42,18 @@ class Container(Component):
         super().__init__()
         self.stdscr = stdscr
         self.components = []
+        # Index of the selected component and the indices of all selectable components
+        self.selected_index = None
+        self._selectable_indices = []
+        # Position of the selected component within _selectable_indices
+        self._selected_pos = None
+        # Buffer the whole frame so it can be written in a few batched calls
+        self.buffer = RenderBuffer()
+        # Row each component started on and how many rows it took when it was last drawn
+        self._rows = []
+        self._heights = []
+        # First row below the last component
+        self._end_row = 0
         # Set container boundaries
         # self.bbox_left = 0
         # self.bbox_right = 0
@@ -42,53 +61,78 @@ class Container(Component):
         # self.bbox_bottom = 0
 
     def handle_input(self, key):
-        """This will determine up/down navigation between components in the container and update the component accordingly"""
-        if key == -1:
-            return
+        """This will determine up/down navigation between components in the container and update the component accordingly, returning True if it needs redrawing"""
+        if key == -1 or self.selected_index is None:
+            return False
         v_movement = 0
         if key == curses.KEY_DOWN:
             v_movement = 1
         elif key == curses.KEY_UP:
             v_movement = -1
 
-        # Find the next selectable component and select it (wrapping around if necessary)
-        for i, component in enumerate(self.components):
-            if component.selected:
-                component.selected = False
-                component.on_deselect()
-                while self.components[(i + v_movement) % len(self.components)].selectable == False:
-                    v_movement += v_movement // abs(v_movement)
-                next_component = self.components[(i + v_movement) % len(self.components)]
-                next_component.selected = True
-                next_component.on_select()
-                break
+        # Select the next selectable component (wrapping around if necessary)
+        if v_movement:
+            component = self.components[self.selected_index]
+            component.selected = False
+            component.on_deselect()
+            self._selected_pos = (self._selected_pos + v_movement) % len(self._selectable_indices)
+            self.selected_index = self._selectable_indices[self._selected_pos]
+            next_component = self.components[self.selected_index]
+            next_component.selected = True
+            next_component.on_select()
 
         # Handle input for the selected component
-        for component in self.components:
-            if component.selected:
-                component.handle_input(key)
-
-
+        component = self.components[self.selected_index]
+        component.handle_input(key)
+        # Navigating dirties the selected component and button actions dirty the whole container
+        return component.dirty
 
     def update(self):
-        """Update all the components in the container if they are selected"""
-        for component in self.components:
-            if component.selected:
-                component.update()
+        """Update the selected component in the container, returning True if it needs redrawing"""
+        if self.selected_index is None:
+            return False
+        component = self.components[self.selected_index]
+        component.update()
+        return component.dirty
 
     def render(self):
-        """Render all the components in the container"""
+        """Render the components in the container that have changed since the last frame"""
+        t_height, t_width = self.stdscr.getmaxyx()
+        # Components are stacked one under another, a line wider than the terminal wraps and pushes the rest down
+        y = 0
+        for i, component in enumerate(self.components):
+            # A component that has been pushed to a different row has to be redrawn there
+            if component.dirty or self._rows[i] != y:
+                self.buffer.move(y)
+                component.render_to(self.buffer)
+                component.dirty = False
+                self._heights[i] = self.buffer.line_width() // t_width + 1
+            self._rows[i] = y
+            y += self._heights[i]
+        # Clear the rows a taller layout left behind
+        for row in range(y, min(self._end_row, t_height)):
+            self.buffer.move(row)
+        self._end_row = y
+        self.buffer.flush(self.stdscr)
+
+    def mark_dirty(self):
+        """Flag every component for redrawing on the next render"""
         for component in self.components:
-            component.render()
-            self.stdscr.addstr("\n")
+            component.dirty = True
 
     def add_component(self, component, args=()):
         """Add a component to the container"""
         # Create the component by unpacking the args and adding stdscr and container
         self.components.append(component(*args, self.stdscr, self))
-        # If this is the first component that is selectable then select it
-        if self.components[-1].selectable and not any(c.selected for c in self.components):
-            self.components[-1].selected = True
+        self._rows.append(None)
+        self._heights.append(1)
+        if self.components[-1].selectable:
+            self._selectable_indices.append(len(self.components) - 1)
+            # If this is the first component that is selectable then select it
+            if self.selected_index is None:
+                self.selected_index = len(self.components) - 1
+                self._selected_pos = 0
+                self.components[-1].selected = True
 
 class Label(Component):
     """A simple label to display text"""
@@ -99,15 +143,29 @@ class Label(Component):
         self.text = text
         self.stdscr = stdscr
         self.container = container
-        # Create colour object
-        self.colours = Colours()
+        # Shared colour object
+        self.colours = get_colours()
 
-    def render(self):
-        """Render the label to the curses window"""
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._text = text
+        self._rendered = f"⌡{text}⌠"
+        # (terminal width, padding) from the last render, the padding depends on the text
+        self._pad_cache = None
+        self.dirty = True
+
+    def render_to(self, buffer):
+        """Queue the label onto the render buffer"""
         _, t_width = self.stdscr.getmaxyx()
-        padding = (t_width - len(self.text) - 2) // 2
-        self.stdscr.addstr(" " * padding)
-        self.stdscr.addstr(f"⌡{self.text}⌠", self.colours.get_colour("green"))
+        if self._pad_cache is None or self._pad_cache[0] != t_width:
+            self._pad_cache = (t_width, spaces((t_width - len(self.text) - 2) // 2))
+        padding = self._pad_cache[1]
+        # Padding has no foreground so it can share the label's colour and go out in one call
+        buffer.add(padding + self._rendered, self.colours.green)
 
 class Combobox(Component):
     """A simple combo box allowing left/right navigation to select an item"""
@@ -117,39 +175,45 @@ class Combobox(Component):
         self.selectable = True
         self.selected = False
         self.items = items
+        # Drawn form of each item so render doesn't rebuild it every frame
+        self._rendered_items = [f" {item} " for item in items]
         self.index = 0
         self.stdscr = stdscr
-        # Create colour object
-        self.colours = Colours()
+        # Shared colour object
+        self.colours = get_colours()
 
     def handle_input(self, key):
         """Handle input for the combo box, moving left/right to select an item"""
         if key == -1:
             return
+        index = self.index
         if key == curses.KEY_LEFT:
             self.index = max(0, self.index - 1)
         elif key == curses.KEY_RIGHT:
             self.index = min(len(self.items) - 1, self.index + 1)
+        if self.index != index:
+            self.dirty = True
 
-    def render(self):
-        """Render the combo box to the curses window with left/right arrows around the selected item"""
+    def render_to(self, buffer):
+        """Queue the combo box onto the render buffer with left/right arrows around the selected item"""
         # Highlight in white if selected
-        col = self.colours.get_colour("black")
         if self.selected:
-            col = self.colours.get_colour("white")
+            col, col_bold = self.colours.white, self.colours.white_bold
+        else:
+            col, col_bold = self.colours.black, self.colours.black_bold
 
         _, t_width = self.stdscr.getmaxyx()
         if self.index > 0 or self.index < len(self.items) - 1:
             t_width -= 1
         padding = (t_width - len(self.value) - 2) // 2
-        self.stdscr.addstr(" " * padding)
+        buffer.add(spaces(padding))
 
         # Draw the selection with arrows
         if self.index > 0:
-            self.stdscr.addstr("◄", col | curses.A_BOLD)
-        self.stdscr.addstr(f" {self.value} ", col)
+            buffer.add("◄", col_bold)
+        buffer.add(self._rendered_items[self.index], col)
         if self.index < len(self.items) - 1:
-            self.stdscr.addstr("►", col | curses.A_BOLD)
+            buffer.add("►", col_bold)
 
     @property
     def value(self):
@@ -166,16 +230,22 @@ class Button(Component):
         self.stdscr = stdscr
         self.container = container
         self.action = action
-        # Create colour object
-        self.colours = Colours()
+        # The text never changes so build the drawn string once
+        self._rendered = f"[{text}]"
+        # (terminal width, padding) from the last render
+        self._pad_cache = None
+        # Shared colour object
+        self.colours = get_colours()
 
     def handle_input(self, key):
         """Handle input for the button, performing the action when selected"""
         if key == -1:
             return
         if key == ord("\n"):
-            logging.info(f"Button pressed: {self.text}")
+            logging.info("Button pressed: %s", self.text)
             self.action()
+            # The action may have changed anything in the container so redraw it all
+            self.container.mark_dirty()
             # Clear input buffer
             curses.flushinp()
 
@@ -183,18 +253,24 @@ class Button(Component):
         """Perform the action when key is pressed and button is selected"""
         pass
 
-    def render(self):
-        """Render the button to the curses window"""
-        col = self.colours.get_colour("black")
+    def render_to(self, buffer):
+        """Queue the button onto the render buffer"""
+        col = self.colours.black
         if self.selected:
-            col = self.colours.get_colour("highlight")
+            col = self.colours.highlight
             if self.text == "Quit":
-                col = self.colours.get_colour("highlight_red")
+                col = self.colours.highlight_red
 
         _, t_width = self.stdscr.getmaxyx()
-        padding = (t_width - len(self.text) - 1) // 2
-        self.stdscr.addstr(" " * padding)
-        self.stdscr.addstr(f"[{self.text}]", col)
+        if self._pad_cache is None or self._pad_cache[0] != t_width:
+            self._pad_cache = (t_width, spaces((t_width - len(self.text) - 1) // 2))
+        padding = self._pad_cache[1]
+        if self.selected:
+            # Keep the highlight off the padding
+            buffer.add(padding)
+            buffer.add(self._rendered, col)
+        else:
+            buffer.add(padding + self._rendered, col)
 
 class MenuList():
     """This is the same as menu with different rendering logic"""
@@ -214,7 +290,7 @@ class MenuList():
         self.width += self.h_padding
 
         # Set up colours
-        self.colours = Colours()
+        self.colours = get_colours()
 
         # Define scr
         self.stdscr = stdscr
@@ -223,8 +299,16 @@ class MenuList():
         self.menu_title_height = 2
         self.offset = 0
 
+        # Only redraw when something has changed
+        self.dirty = True
+
+        # Centred line layouts for each item keyed by (item, terminal width)
+        self._wrap_cache = {}
+
     def handle_input(self, key):
         """Get keyboard input to navigate the menu,"""
+        if key != -1:
+            self.dirty = True
         vinput = 0
         if key == curses.KEY_UP:
             vinput -= 1
@@ -249,12 +333,9 @@ class MenuList():
             vinput = len(self.items) - 1 - self.selected
 
         # Escape to invoke the "Back" function if one exists
-        # This is slow for some reason
         if key == curses.ascii.ESC:
-            if "Back" in self.items:
-                # Find the index of the back button
-                back_index = self.items.index("Back")
-                return self.functions[back_index]
+            if self._back_index is not None:
+                return self.functions[self._back_index]
 
         # Update the selected item
         self.selected += vinput
@@ -286,10 +367,9 @@ class MenuList():
             # Get the y pos
             y, x = self.stdscr.getyx()
             # Draw menu title in italic yellow
-            col = self.colours.get_colour('yellow')
+            col = self.colours.yellow
             xoffset = round((t_width - len(self.menu_title)) * 0.5)
-            self.stdscr.addstr(" " * xoffset + self.menu_title, col | curses.A_ITALIC)
-            self.stdscr.addstr("\n")
+            self.stdscr.addstr(spaces(xoffset) + self.menu_title + "\n", col | curses.A_ITALIC)
             # Draw a line under the title
             self.stdscr.addstr("." * t_width, col)
             dy = self.stdscr.getyx()[0] - y
@@ -300,66 +380,83 @@ class MenuList():
         # Call the scroll function to adjust the scroll if needed
         self.offset, self.selected = self.scroll(self.offset, self.selected)
 
-        # We slice items based on the offset
-        items_to_render = self.items[self.offset:self.offset + t_height - dy]
-        # Draw the items - this will except if it goes out of bounds
-        for index, item in enumerate(items_to_render):
-            try:
-                col = self.colours.get_colour('black')
-                if index + self.offset == self.selected:
-                    col = self.colours.get_colour('highlight')
-
-                # Centre the item
-                if len(item) < t_width:
-                    xoffset = floor((t_width - len(item)) * 0.5)
-                    self.stdscr.addstr(" " * xoffset)
-                    self.stdscr.addstr(item, col)
-                else:
-                    try:
-                        # We need to do string slicing to get the item to fit
-                        # Split string and add one word at a time until we overflow the terminal
-                        words = item.split(" ")
-                        lines = [""]
-                        lines_index = 0
-                        for word in words:
-                            if len(lines[lines_index]) + len(word) + 1 < t_width:
-                                lines[lines_index] += word + " "
-                            else:
-                                # Cut the last space
-                                lines[lines_index] = lines[lines_index][:-1]
-                                lines_index += 1
-                                lines.append(word + " ")
-
-                        # Now we can draw the lines centred
-                        for i, line in enumerate(lines):
-                            xoffset = floor((t_width - len(line)) * 0.5)
-                            self.stdscr.addstr(" " * xoffset)
-                            self.stdscr.addstr(line, col)
-                            if i < len(lines) - 1:
-                                self.stdscr.addstr("\n")
-                    except Exception as e:
-                        logging.warning(f"Failed to draw item: {item}")
-                        logging.warning(e)
-                        break
+        # Rows available for items below the title
+        max_rows = t_height - dy
 
+        # Wrapped items take several rows so scroll further if they push the selection off the bottom
+        rows = [len(self.layout(item, t_width)) for item in self.items[self.offset:self.selected + 1]]
+        total_rows = sum(rows)
+        for item_rows in rows:
+            if total_rows <= max_rows or self.offset >= self.selected:
+                break
+            total_rows -= item_rows
+            self.offset += 1
+
+        # Draw the items until we run out of rows
+        rows_used = 0
+        for index, item in enumerate(self.items[self.offset:]):
+            lines = self.layout(item, t_width)
+            if rows_used + len(lines) > max_rows:
+                break
+            rows_used += len(lines)
+
+            selected = index + self.offset == self.selected
+            col = self.colours.highlight if selected else self.colours.black
+
+            # Draw the centred lines
+            for padding, line in lines:
+                if selected:
+                    # Keep the highlight off the padding
+                    self.stdscr.addstr(padding)
+                    self.stdscr.addstr(line, col)
+                else:
+                    self.stdscr.addstr(padding + line, col)
                 try:
                     self.stdscr.addstr("\n")
-                except:
-                    break
-            except Exception as e:
-                # In this case we've gone out of bounds so ensure selection is within bounds
-                # I don't think this ever happens
-                y, _ = self.stdscr.getyx()
-                if y > t_height:
-                    # This will adjust the scroll if needed
-                    if index - self.offset - dy <= self.selected:
-                        logging.debug(f"Adjusting scroll up by {y - t_height - dy}")
-                        self.offset -= (y - t_height - dy)
-                        self.stdscr.clear()
-                        self.stdscr.refresh()
-                        self.render()
+                except curses.error:
+                    # There's no row to move onto after the bottom of the screen
                     break
 
+        # Clear anything left over from a longer list
+        self.stdscr.clrtobot()
+
+        self.dirty = False
+
+    def layout(self, item, t_width):
+        """Get the centred (padding, text) lines for an item, wrapping it if it doesn't fit"""
+        key = (item, t_width)
+        lines = self._wrap_cache.get(key)
+        if lines is not None:
+            return lines
+
+        if len(item) < t_width:
+            lines = [item]
+        else:
+            # We need to do string slicing to get the item to fit
+            # Leave room for a trailing space and the last column so no line wraps onto a row we haven't counted
+            lines = wrap_words(item, t_width - 2)
+            # The last line keeps its trailing space so the highlight and centring stay as they were
+            lines[-1] += " "
+
+        # Build the padding strings once rather than every frame
+        lines = [(spaces(floor((t_width - len(line)) * 0.5)), line) for line in lines]
+
+        # Layouts for an old terminal width won't be used again
+        if self._wrap_cache and next(iter(self._wrap_cache))[1] != t_width:
+            self._wrap_cache.clear()
+        self._wrap_cache[key] = lines
+        return lines
+
+    @property
+    def items(self):
+        return self._items
+
+    @items.setter
+    def items(self, items):
+        self._items = items
+        # Find the back button once rather than searching on every escape press
+        self._back_index = items.index("Back") if "Back" in items else None
+
     def scroll(self, scroll, selection):
         """Scroll a number between min and max"""
         # Adjust scroll if needed
@@ -388,30 +485,50 @@ class TextInput(Component):
         super().__init__()
         self.selectable = True
         self.selected = False
-        self.text = ""
+        # Typed characters, joined into text only when it's read after an edit
+        self._chars = []
+        self._text = ""
         self.stdscr = stdscr
         self.container = container
-        # Create colour object
-        self.colours = Colours()
+        # (cache key, padding) from the last render
+        self._pad_cache = None
+        # Shared colour object
+        self.colours = get_colours()
 
     def handle_input(self, key):
         """Handle input for the text input, adding characters to the text"""
         if key == -1:
             return
         if key == curses.ascii.ESC:
-            self.text = ""
+            self._chars.clear()
+            self.on_edit()
         elif key == curses.ascii.BS:
-            self.text = self.text[:-1]
+            if self._chars:
+                self._chars.pop()
+                self.on_edit()
         elif key == ord("\n"):
-            logging.info(f"Text input: {self.text}")
+            logging.info("Text input: %s", self.text)
         elif key < 256:
-            self.text += chr(key)
+            self._chars.append(chr(key))
+            self.on_edit()
 
-    def render(self):
-        """Render the text input to the curses window"""
-        col = self.colours.get_colour("black")
+    def on_edit(self):
+        """Invalidate the cached text and padding after the characters change"""
+        self._text = None
+        self._pad_cache = None
+        self.dirty = True
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self._chars)
+        return self._text
+
+    def render_to(self, buffer):
+        """Queue the text input onto the render buffer"""
+        col = self.colours.black
         if self.selected:
-            col = self.colours.get_colour("highlight")
+            col = self.colours.highlight
 
         # Draw this if selected
         if self.selected:
@@ -420,6 +537,14 @@ class TextInput(Component):
             prepend = ""
 
         _, t_width = self.stdscr.getmaxyx()
-        padding = (t_width - len(self.text) - len(prepend) - 1) // 2
-        self.stdscr.addstr(" " * padding)
-        self.stdscr.addstr(f"{prepend}{self.text}", col)
+        # The prepend changes the width so the selection is part of the cache key
+        pad_key = (t_width, self.selected)
+        if self._pad_cache is None or self._pad_cache[0] != pad_key:
+            self._pad_cache = (pad_key, spaces((t_width - len(self.text) - len(prepend) - 1) // 2))
+        padding = self._pad_cache[1]
+        if self.selected:
+            # Keep the highlight off the padding
+            buffer.add(padding)
+            buffer.add(f"{prepend}{self.text}", col)
+        else:
+            buffer.add(padding + f"{prepend}{self.text}", col)
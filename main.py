@@ -1,66 +1,75 @@
-import calendar
-import random
 import curses
-import atexit
 import logging
+import logging.handlers
 import os
-from time import sleep
-from datetime import datetime
-from components import Container, Label, Combobox, Button
-from activity import Activity, read_activities, write_activities
 from states import StateMain
 
 
-# Set up logging
-if not os.path.exists('logs'):
-    os.makedirs('logs')
-logging.basicConfig(filename=f'logs/week_planner_{datetime.now()}.log', level=logging.DEBUG)
+def setup_logging():
+    """Log to a rotating file in logs/"""
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+    # One rotating log file rather than a new file every run
+    log_file = logging.handlers.RotatingFileHandler("logs/week_planner.log", maxBytes=1_000_000, backupCount=3)
+    log_file.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    # Hold records in memory and write them in batches, errors are written straight away
+    log_handler = logging.handlers.MemoryHandler(capacity=1024, target=log_file)
+    # Set WEEK_PLANNER_LOG_LEVEL to change the level, e.g. DEBUG when debugging
+    logging.basicConfig(handlers=[log_handler], level=os.environ.get("WEEK_PLANNER_LOG_LEVEL", "INFO").upper())
 
-# Register exit function to clean up curses
-@atexit.register
-def cleanup():
-    curses.nocbreak()
-    stdscr.keypad(False)
-    curses.echo()
-    curses.endwin()
-    curses.curs_set(0)
 
+def main(stdscr):
+    # curses.wrapper has already set up noecho, cbreak and keypad
+    # Block until a key arrives, nothing needs to happen while idle
+    stdscr.timeout(-1)
+    curses.curs_set(0)
 
-def main():
     try:
         # Instantiate the main state
         state = StateMain(stdscr)
 
+        # Draw the first frame, after this we only redraw in response to input
+        state.render()
+
         # Main loop
         while True:
-            # Set curses x/y to 0
-            stdscr.move(0, 0)
+            # getch blocks until there's input so the loop does nothing while idle
             c = stdscr.getch()
-            state.handle_input(c)
+            if c == -1:
+                continue
+            dirty = False
+            if c == curses.KEY_RESIZE:
+                stdscr.clear()
+                state.invalidate()
+                dirty = True
+            dirty |= state.handle_input(c)
             state_change = state.update()
-            state.render()
             if c == ord('q'):
                 break
 
             if state_change:
                 state = state_change
-                stdscr.clear()
+                # erase rather than clear so curses only sends the cells that differ
+                stdscr.erase()
+                state.invalidate()
+                dirty = True
 
-            stdscr.refresh()
+            # Skip drawing entirely for keys that didn't change anything
+            if dirty:
+                # Set curses x/y to 0
+                stdscr.move(0, 0)
+                # Only the components that changed are redrawn
+                state.render()
+
+                # Let curses diff the virtual screen and send only what changed
+                stdscr.noutrefresh()
+                curses.doupdate()
 
     except Exception as e:
         logging.exception(e)
 
 
-
-
 if __name__ == "__main__":
-    # Initialise curses
-    stdscr = curses.initscr()
-    curses.noecho()
-    curses.cbreak()
-    stdscr.keypad(True)
-    stdscr.nodelay(1)
-    curses.curs_set(0)
-
-    main()
+    setup_logging()
+    # wrapper initialises curses and restores the terminal however main exits
+    curses.wrapper(main)
@@ -0,0 +1,42 @@
+"""Frame buffer for batching curses output"""
+
+class RenderBuffer:
+    """Collects styled text for a frame and writes it with as few addstr calls as possible"""
+    def __init__(self):
+        # List of (row, runs) lines, row is None to draw from the current cursor position
+        # Each run is [text_parts, attr] and adjacent text with the same attr shares a run
+        self.lines = []
+
+    def move(self, y):
+        """Start a new line at row y, replacing whatever was drawn there before"""
+        self.lines.append((y, []))
+
+    def add(self, text, attr=0):
+        """Queue some text to be drawn with the given attribute"""
+        if not text:
+            return
+        if not self.lines:
+            self.lines.append((None, []))
+        runs = self.lines[-1][1]
+        if runs and runs[-1][1] == attr:
+            runs[-1][0].append(text)
+        else:
+            runs.append([[text], attr])
+
+    def line_width(self):
+        """Get the number of characters queued on the current line"""
+        if not self.lines:
+            return 0
+        return sum(len(text) for parts, _ in self.lines[-1][1] for text in parts)
+
+    def flush(self, stdscr):
+        """Write the queued lines to the curses window, one addstr per run"""
+        lines, self.lines = self.lines, []
+        for y, runs in lines:
+            if y is not None:
+                stdscr.move(y, 0)
+            for parts, attr in runs:
+                stdscr.addstr("".join(parts), attr)
+            if y is not None:
+                # Clear after the text rather than before so the tail of a line that wrapped is cleared too
+                stdscr.clrtoeol()
@@ -5,19 +5,27 @@ import os
 import logging
 from datetime import datetime
 
-from activity import Activity, read_activities, write_activities
+from activity import Activity, read_activities, read_activity_choices, write_activities, activities_version
 from components import *
 
 state_history = []
 
+# Day names are locale lookups on every access so resolve them once
+DAY_NAMES = tuple(calendar.day_name)
+
 class State:
     def __init__(self, stdscr):
         self.stdscr = stdscr
         self.container = None
         self.next_state = None
+        # Activities waiting to be written to activities.txt at the end of this tick
+        self._pending_write = None
         state_history.append(self)
 
     def update(self):
+        # Write before changing state so the next state reads the saved activities
+        self.flush_write()
+
         if self.next_state:
             regressing = False
             if state_history[-1] == self.next_state:
@@ -29,12 +37,18 @@ class State:
             if regressing:
                 state.on_regress()
 
+            # A state that's been popped off the history won't be shown again
+            if self not in state_history:
+                self.release()
+
             return state
         return None
 
     def handle_input(self, key):
+        """Pass input on to the container, returning True if the screen needs redrawing"""
         if self.container:
-            self.container.handle_input(key)
+            return self.container.handle_input(key)
+        return False
 
     def render(self):
         if self.container:
@@ -50,48 +64,73 @@ class State:
     def on_regress(self):
         pass
 
+    def queue_write(self, activities):
+        """Save activities on the next update, repeated saves in the same tick only write once"""
+        self._pending_write = activities
+
+    def flush_write(self):
+        """Write any queued activities to activities.txt"""
+        if self._pending_write is not None:
+            write_activities('activities.txt', self._pending_write)
+            self._pending_write = None
+
+    def release(self):
+        """Drop the references a finished state holds so it can be freed straight away"""
+        # Button actions refer back to the state, so the container forms a reference cycle
+        self.container = None
+        self.next_state = None
+
+    def invalidate(self):
+        """Force everything to be redrawn on the next render, e.g. after the screen was cleared"""
+        if self.container:
+            self.container.mark_dirty()
+
     def get_random_activity(self):
+        return self.get_random_activities(1)[0]
+
+    def get_random_activities(self, k):
+        """Pick k activities at random, weighted by priority"""
         activities = read_activities('activities.txt')
         # Adjust priorities based on when activities were last recommended
         activities = self.adjust_priorities(activities)
 
-        # Now we make up a list with each activity * priority
-        choices = []
-        for activity in activities:
-            for i in range(activity.priority):
-                choices.append(activity.choice)
-
-        return random.choice(choices)
+        population = [activity.choice for activity in activities]
+        weights = [activity.priority for activity in activities]
+        return random.choices(population, weights=weights, k=k)
 
     def adjust_priorities(self, activities):
         """Looks at previous weeks plan and adjusts priorities"""
-        plans = os.listdir("plans")
+        # Only exported plans, skipping anything else that ended up in the directory
+        with os.scandir("plans") as entries:
+            plans = [e for e in entries if e.is_file() and e.name.startswith("week_plan_")]
         if len(plans) > 0:
-            # Sort by date
-            plans.sort(reverse=True)
-            all_activities = [activity.get_activity() for activity in activities]
-            found_activities = []
+            # Sort by date, newest first (the filenames end in YYYY-MM-DD)
+            plans.sort(key=lambda e: e.name, reverse=True)
+            all_activities = {activity.choice for activity in activities}
+            found_activities = set()
             for plan in plans:
-                logging.info(f"Reading plan: {plan}")
-                with open (f"plans/{plan}", "r") as f:
+                # If there's no activities left then there's no need to open any more plans
+                if not all_activities:
+                    break
+
+                logging.info("Reading plan: %s", plan.name)
+                with open (plan.path, "r", encoding="utf-8") as f:
                     for line in f:
-                        activity = line.split(":")[1].strip()
+                        # Lines are "Day: Activity", partition avoids building a list
+                        _, _, activity = line.partition(":")
+                        activity = activity.strip()
                         if activity in all_activities:
-                            found_activities.append(activity)
+                            found_activities.add(activity)
                             all_activities.remove(activity)
 
-                logging.info(f"Found activities: {found_activities}")
-                logging.info(f"Remaining activities: {all_activities}")
-
-                # Increase priority of not found activities
-                for activity in activities:
-                    if activity.get_activity() not in found_activities:
-                        logging.info(f"Increasing priority of {activity.get_activity()}")
-                        activity.priority += 1
+                logging.info("Found activities: %s", found_activities)
+                logging.info("Remaining activities: %s", all_activities)
 
-                # If there's no activities left then break
-                if not all_activities:
-                    break
+            # Increase priority of activities that weren't in any plan, once after all plans are read
+            for activity in activities:
+                if activity.choice not in found_activities:
+                    logging.info("Increasing priority of %s", activity.choice)
+                    activity.priority += 1
 
         return activities
 
@@ -121,13 +160,15 @@ class StateWeekPlanner(State):
 
         filename = 'activities.txt'
 
-        # Get activities so we can make comboboxes for them
-        activities = read_activities(filename)
-
-        activity_labels = [activity.get_activity() for activity in activities]
+        # Get activity names so we can make comboboxes for them
+        activity_labels = read_activity_choices(filename)
+        # Map labels to combobox indices for randomising, keeping the first if a name is repeated
+        self.label_to_index = {}
+        for i, label in enumerate(activity_labels):
+            self.label_to_index.setdefault(label, i)
 
         # Create a combobox for each day of the week
-        for day in calendar.day_name:
+        for day in DAY_NAMES:
             self.container.add_component(Label, [day])
             self.container.add_component(Combobox, [activity_labels])
 
@@ -141,25 +182,18 @@ class StateWeekPlanner(State):
         # Get our containers components
         components = self.container.components
 
-        for component in components:
-            if isinstance(component, Combobox):
-                choice = self.get_random_activity()
-                component.index = component.items.index(choice)
+        comboboxes = [c for c in components if isinstance(c, Combobox)]
+        # Pick every day's activity in one go
+        choices = self.get_random_activities(len(comboboxes))
+        for component, choice in zip(comboboxes, choices):
+            component.index = self.label_to_index[choice]
 
     def export_plan(self):
         """Export the plan to a file with the current date as the filename"""
-        components = self.container.components
-        plan = ""
-        days = [day for day in calendar.day_name]
-        days = iter(days)
-        day = next(days)
-        for component in components:
-            if isinstance(component, Combobox):
-                plan += f"{day}: {component.items[component.index]}\n"
-                try:
-                    day = next(days)
-                except:
-                    pass
+        comboboxes = [c for c in self.container.components if isinstance(c, Combobox)]
+        # There's one combobox per day in the same order
+        lines = [f"{day}: {component.value}" for day, component in zip(DAY_NAMES, comboboxes)]
+        plan = "\n".join(lines) + "\n"
 
         # Write plan to file with current date
         filename = f"week_plan_{datetime.now().strftime('%Y-%m-%d')}.txt"
@@ -167,7 +201,7 @@ class StateWeekPlanner(State):
         if not os.path.isdir("plans"):
             os.mkdir("plans")
 
-        with open(f"plans/{filename}", "w") as f:
+        with open(f"plans/{filename}", "w", encoding="utf-8", newline="\n") as f:
             f.write(plan)
 
 class StateRandomActivity(State):
@@ -211,38 +245,58 @@ class StateEditActivities(State):
         callback = self.list_menu.handle_input(key)
         if callback:
             callback()
+        return self.list_menu.dirty
 
     def render(self):
-        self.list_menu.render()
+        if self.list_menu.dirty:
+            self.list_menu.render()
+
+    def invalidate(self):
+        self.list_menu.dirty = True
+
+    def release(self):
+        super().release()
+        self.list_menu = None
 
     def create_list_menu(self):
-        activities = read_activities('activities.txt')
-        activities = [activity.get_activity() for activity in activities]
-        functions = [lambda activity=activity: self.advance_state(StateEditActivity(self.stdscr, activity)) for activity in activities]
-        # Add a back button
-        activities.append("Back")
-        functions.append(lambda: self.regress_state())
+        activities, functions = self.menu_entries()
         # Now make the list menu
         self.list_menu = MenuList(self.stdscr, activities, functions, "Welcome to Edit Activities!")
+        # Remember which version of the file the menu was built from
+        self._last_version = activities_version('activities.txt')
 
     def update_list_menu(self):
         # Similar to above but overwrite the functions and activities for the menu
-        activities = read_activities('activities.txt')
-        activities = [activity.get_activity() for activity in activities]
-        functions = [lambda activity=activity: self.advance_state(StateEditActivity(self.stdscr, activity)) for activity in activities]
-        # Add a back button
-        activities.append("Back")
-        functions.append(lambda: self.regress_state())
+        activities, functions = self.menu_entries()
 
         self.list_menu.functions = functions
         self.list_menu.items = activities
+        self.list_menu.dirty = True
+        self._last_version = activities_version('activities.txt')
 
         if self.list_menu.selected > 0:
             self.list_menu.selected -= 1
 
 
+    def menu_entries(self):
+        """Get the menu items and their functions, every activity shares the same function"""
+        # Only the names are needed so skip building Activity objects
+        activities = read_activity_choices('activities.txt')
+        functions = [self.open_selected_activity] * len(activities)
+        # Add a back button
+        activities.append("Back")
+        functions.append(self.regress_state)
+        return activities, functions
+
+    def open_selected_activity(self):
+        """Edit the activity that's currently selected in the menu"""
+        activity = self.list_menu.items[self.list_menu.selected]
+        self.advance_state(StateEditActivity(self.stdscr, activity))
+
     def on_regress(self):
-        """Refresh the list of functions"""
+        """Refresh the list of functions if the activities have changed"""
+        if activities_version('activities.txt') == self._last_version:
+            return
         self.update_list_menu()
 
 
@@ -261,13 +315,12 @@ class StateEditActivity(State):
         """Initialise the main state"""
         super().__init__(stdscr)
         # Get all the activities
-        logging.info(f"Activity to edit: {activity}")
+        logging.info("Activity to edit: %s", activity)
         self.activities = read_activities('activities.txt')
-        # Find our priority
-        for a in self.activities:
-            if a.get_activity() == activity:
-                priority = a.priority
-                break
+        # Find our activity once so saving and deleting don't have to search for it again
+        # Kept as an index into the list since names aren't guaranteed to be unique
+        self.activity_index = next(i for i, a in enumerate(self.activities) if a.choice == activity)
+        priority = self.activities[self.activity_index].priority
         self.activity = activity
         self.container = Container(stdscr)
         self.container.add_component(Label, ["Welcome to Edit Activity!"])
@@ -283,27 +336,20 @@ class StateEditActivity(State):
 
     def delete_activity(self):
         """Removes acitivty from activities.txt"""
-        # Loop over activities and remove the one we want
-        for a in self.activities:
-            if a.get_activity() == self.activity:
-                self.activities.remove(a)
-                break
+        del self.activities[self.activity_index]
 
         # Write activities back to file
-        write_activities('activities.txt', self.activities)
+        self.queue_write(self.activities)
 
         # Then regress the state - why doesn't this work?
         self.regress_state()
 
     def save_activity(self):
         """Alter the priority of the activity"""
-        for a in self.activities:
-            if a.get_activity() == self.activity:
-                a.priority = self.container.components[2].index
-                break
+        self.activities[self.activity_index].priority = self.container.components[2].index
 
         # Write activities back to file
-        write_activities('activities.txt', self.activities)
+        self.queue_write(self.activities)
 
 class StateNewActivity(State):
     def __init__(self, stdscr):
@@ -329,6 +375,6 @@ class StateNewActivity(State):
         # Add the new activity
         activities.append(Activity(name, priority))
         # Write the activities back to file
-        write_activities('activities.txt', activities)
+        self.queue_write(activities)
         # Regress the state
         self.regress_state()
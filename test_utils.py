@@ -0,0 +1,22 @@
+import unittest
+
+from utils import wrap_words
+
+
+class WrapWordsTest(unittest.TestCase):
+    def test_breaks_at_spaces(self):
+        self.assertEqual(wrap_words("go for a walk", 8), ["go for a", "walk"])
+
+    def test_splits_word_longer_than_width(self):
+        # A single word wider than the terminal used to be kept whole and wrap onto uncounted rows
+        lines = wrap_words("a" * 45, 38)
+        self.assertEqual(lines, ["a" * 38, "a" * 7])
+
+    def test_long_word_mid_text(self):
+        lines = wrap_words("read " + "b" * 25 + " later", 10)
+        self.assertTrue(all(len(line) <= 10 for line in lines))
+        self.assertEqual("".join(lines).replace(" ", ""), "read" + "b" * 25 + "later")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,2 +1,36 @@
 def clamp(n, smallest, largest):
     return max(smallest, min(n, largest))
+
+# Prebuilt run of spaces so padding can be sliced instead of allocated
+_SPACES = " " * 512
+
+def spaces(n):
+    """Return a string of n spaces (empty if n is negative)"""
+    if n <= len(_SPACES):
+        return _SPACES[:max(n, 0)]
+    return " " * n
+
+def wrap_words(text, width):
+    """Split text into lines of at most width characters, breaking at spaces where possible"""
+    width = max(width, 1)
+    # Words too long for a line of their own are cut into pieces that fit
+    words = []
+    for word in text.split(" "):
+        if len(word) > width:
+            words.extend(word[i:i + width] for i in range(0, len(word), width))
+        else:
+            words.append(word)
+
+    # Track the width of the current line and join its words once it would overflow
+    lines = []
+    start, line_width = 0, 0
+    for i, word in enumerate(words):
+        # Width of the line with this word added, including the space before it
+        new_width = line_width + len(word) + (1 if i > start else 0)
+        if new_width <= width or i == start:
+            line_width = new_width
+        else:
+            lines.append(" ".join(words[start:i]))
+            start, line_width = i, len(word)
+    lines.append(" ".join(words[start:]))
+    return lines